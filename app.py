@@ -1,16 +1,14 @@
 import streamlit as st
-import asyncio
 import os
-import pandas as pd
-from io import BytesIO
-from src.places_api import search_places, get_coordinates
-from src.business_info import process_businesses
-from src.data_export import save_places_to_excel
-from src.utils import get_current_date
+import time
+from src.job_manager import JobManager, COMPLETED
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Seconds between UI refreshes while a job is running
+POLL_INTERVAL = 1
+
 # Set page config
 st.set_page_config(
     page_title="Google Maps Lead Generator",
@@ -61,6 +59,21 @@ with st.sidebar:
         os.environ["LLM_MODEL"] = llm_model
         st.success("Settings saved for this session!")
 
+@st.cache_resource
+def get_job_manager():
+    """
+    Shared job manager, kept alive across reruns and browser refreshes
+    """
+    return JobManager()
+
+job_manager = get_job_manager()
+
+# Restore the current job from the URL so a browser refresh doesn't lose the run
+if "job_id" not in st.session_state:
+    st.session_state.job_id = st.query_params.get("job")
+
+job = job_manager.get_job(st.session_state.job_id) if st.session_state.job_id else None
+
 # Main form
 with st.form("search_form"):
     col1, col2 = st.columns(2)
@@ -73,59 +86,20 @@ with st.form("search_form"):
         num_places = st.number_input("Number of Places to Scrape", min_value=20, max_value=1000, value=20, step=20)
         num_pages = max(1, num_places // 20)  # Calculate number of pages (20 results per page)
     
-    submit_button = st.form_submit_button("Start Lead Generation")
-
-# Initialize session state if not already done
-if "excel_path" not in st.session_state:
-    st.session_state.excel_path = None
-
-async def main_with_progress(location, search_query, num_pages):
-    """
-    Main function with progress reporting for Streamlit
-    """
-    # Status placeholder for showing current operation
-    status = st.empty()
-    
-    # Step 1: Get coordinates from location
-    status.text("🔍 Getting coordinates for location...")
-    coords = get_coordinates(location)
-    if not coords:
-        st.error("❌ Could not get coordinates for the location. Please check the location name and try again.")
-        return None
-        
-    # Step 2: Search for places using Serper Maps API
-    status.text("🔍 Searching for businesses using Serper Maps API...")
-    places_data = search_places(search_query, coords, num_pages)
-    if not places_data:
-        st.error("❌ No places found. Try a different search query or location.")
-        return None
-        
-    # Step 3: Save places data to Excel
-    status.text("💾 Saving initial data to Excel...")
-    excel_filename = f"data_{search_query}_{location}_{get_current_date()}.xlsx"
-    
-    # Make sure excel file is saved in the data directory
-    file_path = save_places_to_excel(places_data, excel_filename)
+    # Enrichment budgets, highest value leads are processed first (0 means no limit)
+    with st.expander("Budget"):
+        col3, col4, col5 = st.columns(3)
+        with col3:
+            max_cost = st.number_input("Max LLM Cost ($)", min_value=0.0, value=0.0, step=0.1)
+        with col4:
+            max_tokens = st.number_input("Max LLM Tokens", min_value=0, value=0, step=10000)
+        with col5:
+            max_minutes = st.number_input("Max Duration (minutes)", min_value=0, value=0, step=5)
     
-    # Step 4: Process businesses to get detailed information
-    status.text("🌐 Processing businesses to extract detailed information...")
-    
-    # Create a Streamlit progress bar
-    progress_bar = st.progress(0)
-    progress_text = st.empty()
-    
-    # Define a custom callback to track progress
-    async def progress_callback(total, current, business_name):
-        # Update the progress bar
-        progress_bar.progress((current + 1) / total)
-        progress_text.text(f"Processing: {current + 1}/{total} - {business_name}")
-    
-    # Process the businesses with our progress callback
-    await process_businesses(file_path, progress_callback=progress_callback)
-    
-    status.text("✅ Lead generation complete!")
-    
-    return file_path
+    # Only one job at a time, cancel the current one to start another
+    submit_button = st.form_submit_button(
+        "Start Lead Generation", disabled=bool(job and job.is_active)
+    )
 
 
 # Main execution logic
@@ -133,38 +107,71 @@ if submit_button:
     # Check if API keys are set
     if not os.environ.get("SERPER_API_KEY") or not os.environ.get("OPENROUTER_API_KEY"):
         st.error("⚠️ Please set your API keys in the sidebar before starting.")
+    elif job and job.is_active:
+        st.error("⚠️ A lead generation job is already running. Cancel it before starting a new one.")
     else:
-        with st.spinner("Starting lead generation..."):
-            # Run the async function
-            excel_path = asyncio.run(main_with_progress(location, search_query, num_pages))
-            if excel_path:
-                st.session_state.excel_path = excel_path
+        # Start lead generation in the background
+        budget_limits = {
+            "max_cost": max_cost or None,
+            "max_tokens": max_tokens or None,
+            "max_seconds": max_minutes * 60 or None,
+        }
+        job = job_manager.start_job(location, search_query, num_pages, budget_limits)
+        st.session_state.job_id = job.id
+        st.query_params["job"] = job.id
+
+# Job status section
+if job:
+    st.subheader("Lead Generation Status")
+    st.text(job.message)
+    if job.error:
+        st.error(f"❌ {job.error}")
+    
+    if job.total:
+        st.progress(min(job.processed / job.total, 1.0))
+        st.caption(f"Enriched {job.processed}/{job.total} businesses with a website")
+    if job.budget:
+        cost = f" (${job.budget.cost:.4f})" if job.budget.cost is not None else ""
+        st.caption(f"LLM usage: {job.budget.tokens} tokens{cost}")
+        if job.budget.warning:
+            st.warning(f"⚠️ {job.budget.warning}")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if job.is_active and st.button("⏹️ Cancel"):
+            job_manager.cancel_job(job.id)
+            st.rerun()
+    with col2:
+        if not job.is_active and job.status != COMPLETED and job.file_path and st.button("▶️ Resume"):
+            job_manager.resume_job(job.id)
+            st.rerun()
 
-# Download section - Always check if the file exists
-if st.session_state.excel_path and os.path.exists(st.session_state.excel_path):
+# Results section - Served from the job's in-memory results
+if job and job.df is not None:
     st.subheader("Download Results")
     
     try:
-        # Read the Excel file into a DataFrame
-        df = pd.read_excel(st.session_state.excel_path)
+        df = job.snapshot()
         
         # Display a preview of the data
         if not df.empty:
             st.write(f"Found {len(df)} businesses:")
             st.dataframe(df)
             
-            # Create a download button
-            with open(st.session_state.excel_path, "rb") as excel_file:
-                excel_bytes = excel_file.read()
-                
+            # Downloads are disabled until the job stops writing results
             st.download_button(
                 label="📥 Download Excel File",
-                data=excel_bytes,
-                file_name=os.path.basename(st.session_state.excel_path),
+                data=job.to_excel_bytes() if not job.is_active else b"",
+                file_name=os.path.basename(job.file_path),
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="download_button"
+                key="download_button",
+                disabled=job.is_active
             )
     except Exception as e:
         st.error(f"Error displaying results: {e}")
-        st.write(f"You can find your file at: {st.session_state.excel_path}")
-        
+        st.write(f"You can find your file at: {job.file_path}")
+
+# Poll the background job until it finishes
+if job and job.is_active:
+    time.sleep(POLL_INTERVAL)
+    st.rerun()
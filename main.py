@@ -2,6 +2,7 @@ import asyncio
 from src.places_api import search_places, get_coordinates
 from src.business_info import process_businesses
 from src.data_export import save_places_to_excel
+from src.email_verifier import verify_business_emails
 from src.utils import get_current_date
 from dotenv import load_dotenv
 
@@ -35,7 +36,10 @@ async def main(location, search_query, num_pages):
     save_places_to_excel(places_data, excel_filename)
     
     # Step 4: Process businesses to get detailed information and update Excel file
-    await process_businesses(excel_filename)
+    await process_businesses(excel_filename, target_category=search_query)
+    
+    # Step 5: Verify the emails found and flag undeliverable ones
+    await verify_business_emails(excel_filename)
 
 if __name__ == "__main__":
     location = "Toronto" # Location to search into
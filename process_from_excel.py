@@ -1,5 +1,6 @@
 import asyncio
 from src.business_info import process_businesses
+from src.email_verifier import verify_business_emails
 from dotenv import load_dotenv
 
 
@@ -9,5 +10,6 @@ load_dotenv()
 if __name__ == "__main__":
     excel_file = "data_Solar Roofing_Barcelona_2025-06-09 12:50.xlsx"
     
-    # Run the main function
+    # Run the main function, then verify the emails found
     asyncio.run(process_businesses(excel_file))
+    asyncio.run(verify_business_emails(excel_file))
@@ -1,11 +1,12 @@
 import os
 from typing import List, Dict, TypedDict
 from tqdm.asyncio import tqdm
-from .data_export import update_business_data, load_excel_data
+from .data_export import merge_business_data, load_excel_data
 from .web_scraper import (
     scrape_website, extract_emails_from_content, 
     find_relevant_links
 )
+from .planner import plan_businesses, get_domain, get_social_network
 from .utils import ainvoke_llm
 
 
@@ -25,7 +26,8 @@ async def analyze_business_links(
     links_dict: Dict[str, List[str]], 
     business_name: str, 
     business_location: str, 
-    business_url: str
+    business_url: str,
+    budget=None
 ):
         # Create system prompt for the AI
     system_prompt = f"""
@@ -56,7 +58,8 @@ If no valid option exists for a category, return an empty string.
         system_prompt=system_prompt,
         user_message=user_message,
         response_format=BusinessInfo,
-        temperature=0.1
+        temperature=0.1,
+        budget=budget
     )
     
     return response
@@ -65,7 +68,8 @@ async def analyze_business_emails(
     emails: List[str], 
     business_name: str, 
     business_location: str, 
-    business_url: str
+    business_url: str,
+    budget=None
 ):
     system_prompt = f"""
 Identify all relevant business contact emails. Prioritize general contact addresses (such as info@ or contact@) and emails of key personnel that use the business's domain. Exclude department-specific ones (e.g., press, events) unless no main contact is available.
@@ -89,7 +93,8 @@ If no domain-based business emails are found, provide any available emails, incl
         system_prompt=system_prompt,
         user_message=user_message,
         response_format=EmailsResponse,
-        temperature=0.1
+        temperature=0.1,
+        budget=budget
     )
     
     return response
@@ -97,7 +102,8 @@ If no domain-based business emails are found, provide any available emails, incl
 async def get_business_info(
     business_url: str,
     business_name: str,
-    business_location: str
+    business_location: str,
+    budget=None
 ):
     """
     Get comprehensive business information by scraping the website and analyzing the data.
@@ -106,6 +112,7 @@ async def get_business_info(
         business_url (str): URL of the business website
         business_name (str): Name of the business
         business_location (str): Location of the business
+        budget (Budget, optional): Budget to record LLM token usage against
         
     Returns:
         Dict[str, str]: Business info with social media links and email
@@ -119,12 +126,12 @@ async def get_business_info(
     
     # Analyze the identified links
     links_result = await analyze_business_links(
-        social_links, business_name, business_location, business_url
+        social_links, business_name, business_location, business_url, budget
     )
     
     if emails:
         emails_result = await analyze_business_emails(
-            emails, business_name, business_location, business_url
+            emails, business_name, business_location, business_url, budget
         )
     else:
         emails_result = {'emails': ''}
@@ -138,7 +145,7 @@ async def get_business_info(
             if contact_emails:
                 # Re-analyze with new emails
                 emails_result = await analyze_business_emails(
-                    contact_emails, business_name, business_location, business_url
+                    contact_emails, business_name, business_location, business_url, budget
                 )
 
     # Return combined information
@@ -150,12 +157,29 @@ async def get_business_info(
         'email': " || ".join(emails_result.get('emails', '')),
     }
 
-async def process_businesses(excel_file, progress_callback=None) :
+async def process_businesses(
+    excel_file,
+    progress_callback=None,
+    result_callback=None,
+    cancel_event=None,
+    target_category=None,
+    budget=None,
+    min_score=0.0
+):
     """
     Process a list of businesses to extract detailed information and update the Excel file.
+    Businesses are enriched from the highest to the lowest priority score, see `plan_businesses`.
     
     Args:
         excel_file (str): Path to the Excel file to update
+        progress_callback (callable, optional): Awaited with (total, position, name) before each
+            business, where position counts the businesses being enriched in priority order
+        result_callback (callable, optional): Awaited with (index, info) once a business is enriched
+        cancel_event (threading.Event, optional): When set, stop after the current business
+            and save progress so the run can be resumed later
+        target_category (str, optional): Search query used to score how well businesses match
+        budget (Budget, optional): Token, cost and time limits, the run stops once one is reached
+        min_score (float): Businesses scoring below this are left for a later run
         
     Returns:
         List[Dict]: Enhanced business data with extracted information
@@ -163,29 +187,62 @@ async def process_businesses(excel_file, progress_callback=None) :
     # Load the Excel file into a DataFrame
     df, file_path = load_excel_data(excel_file)
     
-    # Process each business with a progress bar
-    for index, row in tqdm(df.iterrows(), desc="Processing businesses", unit="business"):
-        name = row.get("name", "")
-        url = row.get("website", "")
-        location = row.get("address", "")
-        already_searched = row.get("searched", "")
+    # Decide in which order and how each pending business is handled
+    plan = plan_businesses(df, target_category, min_score)
+    if budget is not None:
+        budget.start()
+    
+    # Social pages and aggregator listings are handled without scraping
+    results = {}
+    cheap = plan.loc[plan["action"].isin(["social", "skip"]), ["website", "action"]]
+    for index, website, action in cheap.itertuples(name=None):
+        info = {get_social_network(get_domain(website)): website} if action == "social" else {}
+        results[index] = info
+        if result_callback and callable(result_callback):
+            await result_callback(index, info)
+    
+    # Process each business with a progress bar, collecting results for a single merge
+    rows = plan.loc[plan["action"] == "enrich", ["name", "website", "address"]]
+    for position, (index, name, url, location) in enumerate(tqdm(
+        rows.itertuples(name=None), total=len(rows), desc="Processing businesses", unit="business"
+    )):
+        if cancel_event is not None and cancel_event.is_set():
+            break
         
-        if not url or already_searched == "YES":
-            continue
+        # Stop gracefully once any budget is exhausted
+        exhausted = budget.exhausted() if budget is not None else None
+        if exhausted:
+            print(f"Stopping enrichment: {exhausted}")
+            break
         
         try:
             # Update UI progress via callback if provided
             if progress_callback and callable(progress_callback):
-                await progress_callback(len(df), index, name)
+                await progress_callback(len(rows), position, name)
                 
             # Get business info
-            info = await get_business_info(url, name, location)
+            info = await get_business_info(url, name, location, budget)
+            results[index] = info
             
-            # Update the business information
-            update_business_data(df, index, info)
+            # Stream the enriched row to the caller if requested
+            if result_callback and callable(result_callback):
+                await result_callback(index, info)
         except Exception as e:
             print(f"Error processing {name}: {e}")
     
+    # Businesses listing the same website page reuse the result of the best scored one
+    with_page = plan[plan["page"] != ""]
+    first_index = with_page.index.to_series().groupby(with_page["page"]).first()
+    for index, page in plan.loc[plan["action"] == "duplicate", "page"].items():
+        source = first_index[page]
+        if source in results:
+            results[index] = results[source]
+            if result_callback and callable(result_callback):
+                await result_callback(index, results[index])
+    
+    # Merge all the business information at once
+    merge_business_data(df, results)
+    
     # Save the updated DataFrame back to Excel
     try:
         df.to_excel(file_path, index=False)
@@ -1,6 +1,51 @@
 import os
+import ast
 import pandas as pd
 
+# Serper place fields mapped to their Excel column names
+PLACE_COLUMNS = {
+    'title': 'name',
+    'address': 'address',
+    'website': 'website',
+    'phoneNumber': 'phone',
+    'description': 'description',
+    'rating': 'rating',
+    'ratingCount': 'reviews',
+    'type': 'category',
+    'priceLevel': 'price_level',
+}
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Columns filled in by the business enrichment step
+ENRICHED_COLUMNS = ['email', 'facebook', 'twitter', 'instagram']
+
+def normalize_opening_hours(opening_hours):
+    """
+    Flatten opening hours dicts into one column per day (e.g. 'hours_monday').
+    
+    Args:
+        opening_hours (pd.Series): Opening hours as dicts, or their string form
+            when loaded back from an older Excel file
+        
+    Returns:
+        pd.DataFrame: One column per day, aligned on the input index
+    """
+    def parse(value):
+        if isinstance(value, str) and value.startswith('{'):
+            try:
+                value = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                return {}
+        return value if isinstance(value, dict) else {}
+    
+    hours = pd.DataFrame(opening_hours.map(parse).tolist(), index=opening_hours.index)
+    
+    # Keep days in weekday order, whatever order the API returned them in
+    hours = hours[sorted(hours.columns, key=lambda day: WEEKDAYS.index(day) if day in WEEKDAYS else len(WEEKDAYS))]
+    hours.columns = [f"hours_{str(day).lower()}" for day in hours.columns]
+    return hours.fillna('')
+
 def save_places_to_excel(places_data, filename):
     """
     Save places data to an Excel file in the 'data' folder.
@@ -27,47 +72,56 @@ def save_places_to_excel(places_data, filename):
         print("No places data to save.")
         return
     
-    # Create DataFrame with relevant columns
-    df = pd.DataFrame([{
-        'name': place.get('title', ''),
-        'address': place.get('address', ''),
-        'website': place.get('website', '') or place.get('url', ''),
-        'phone': place.get('phoneNumber', ''),
-        'description': place.get('description', ''),
-        'rating': place.get('rating', ''),
-        'reviews': place.get('ratingCount', ''),
-        'category': place.get('type', ''),
-        'keywords': " || ".join(place.get('types', [])),
-        'price_level': place.get('priceLevel', ''),
-        'opening_hours': place.get('openingHours', {}),
-        'email': '',
-        'facebook': '',
-        'twitter': '',
-        'instagram': '',
-        'searched': 'NO',
-    } for place in all_places])
+    # Build the DataFrame column by column from the raw places
+    places = pd.DataFrame(all_places).reindex(columns=list(PLACE_COLUMNS) + ['url', 'types', 'openingHours'])
+    df = places[list(PLACE_COLUMNS)].rename(columns=PLACE_COLUMNS)
+    website = df['website'].fillna('')
+    df['website'] = website.where(website != '', places['url'].fillna(''))
+    df.insert(
+        df.columns.get_loc('category') + 1,
+        'keywords',
+        places['types'].map(lambda types: " || ".join(types) if isinstance(types, list) else ''),
+    )
+    
+    # Flatten opening hours into one column per day
+    df = pd.concat([df, normalize_opening_hours(places['openingHours'])], axis=1)
+    
+    # Add the columns filled in by the enrichment step
+    for column in ENRICHED_COLUMNS:
+        df[column] = ''
+    df['searched'] = 'NO'
     
     # Save to Excel
     df.to_excel(file_path, index=False)
     print(f"Data saved to {file_path}")
     return file_path
 
-def update_business_data(df, index, info):
+def merge_business_data(df, results):
     """
-    Helper function to update a business's information in the Excel DataFrame.
+    Merge enriched business information into the DataFrame in a single batch.
     
     Args:
         df (pd.DataFrame): DataFrame containing the businesses
-        index: Row index to update
-        info (Dict[str, Any]): Information to update (email, social media links)
+        results (Dict[Any, Dict[str, Any]]): Information to update (email, social media links)
+            keyed by row index. Every row in results is marked as searched.
     """
-    # Update the row with the new information using the provided index
-    if info:
-        df.at[index, 'email'] = info.get('email', '')
-        df.at[index, 'facebook'] = info.get('facebook', '')
-        df.at[index, 'twitter'] = info.get('twitter', '')
-        df.at[index, 'instagram'] = info.get('instagram', '')
-    df.at[index, 'searched'] = "YES"
+    if not results:
+        return
+    
+    # Collect the results into one array per column, then write them all at once.
+    # Rows that returned no information are only marked as searched.
+    enriched = {index: info for index, info in results.items() if info}
+    if enriched:
+        updates = pd.DataFrame(
+            {column: [info.get(column, '') for info in enriched.values()] for column in ENRICHED_COLUMNS},
+            index=list(enriched.keys()),
+        )
+        df.loc[updates.index, ENRICHED_COLUMNS] = updates
+        
+        # Emails changed, so any earlier verification no longer applies
+        if 'email_status' in df.columns:
+            df.loc[updates.index, 'email_status'] = ''
+    df.loc[list(results.keys()), 'searched'] = "YES"
 
 def load_excel_data(filename: str) -> pd.DataFrame:
     """
@@ -95,4 +149,12 @@ def load_excel_data(filename: str) -> pd.DataFrame:
     # Replace Nan with ""
     df = df.fillna("")
     
+    # Flatten opening hours from older files that stored them as raw dicts
+    if 'opening_hours' in df.columns:
+        position = df.columns.get_loc('opening_hours')
+        hours = normalize_opening_hours(df.pop('opening_hours'))
+        hours = hours.drop(columns=[column for column in hours.columns if column in df.columns])
+        for offset, column in enumerate(hours.columns):
+            df.insert(position + offset, column, hours[column])
+    
     return df, file_path
\ No newline at end of file
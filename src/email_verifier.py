@@ -0,0 +1,365 @@
+import os
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import dns.resolver
+import dns.exception
+import dns.asyncresolver
+from .data_export import load_excel_data
+
+# Persistent MX cache, kept next to the Excel files
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "dns_cache.db"
+)
+
+# How long to remember domains that don't exist or don't accept mail
+NEGATIVE_TTL = 3600
+
+# Email verification statuses
+VALID = "valid"                  # Domain accepts mail (MX or A record found)
+DELIVERABLE = "deliverable"      # SMTP server accepted the recipient
+UNDELIVERABLE = "undeliverable"  # SMTP server rejected the recipient
+INVALID_SYNTAX = "invalid_syntax"
+NO_DOMAIN = "no_domain"
+NO_MX = "no_mx"
+UNKNOWN = "unknown"              # Lookup or probe failed, can't tell
+
+LOCAL_PART_PATTERN = re.compile(r"^[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*$")
+DOMAIN_PATTERN = re.compile(r"^([A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63}$")
+
+
+def check_email_syntax(email):
+    """
+    Check that an email address is well formed.
+
+    Returns:
+        str: Lowercased domain of the email, or None if the syntax is invalid
+    """
+    if not email or len(email) > 254 or email.count("@") != 1:
+        return None
+    local_part, domain = email.rsplit("@", 1)
+    if len(local_part) > 64 or not LOCAL_PART_PATTERN.match(local_part):
+        return None
+    if not DOMAIN_PATTERN.match(domain):
+        return None
+    return domain.lower()
+
+
+class DNSCache:
+    """
+    TTL cache of MX lookups, held in memory and persisted to SQLite so
+    lookups are shared across businesses, runs and processes.
+
+    SQLite errors (e.g. a database locked by another job) never fail a lookup,
+    the cache just falls back to memory.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self._entries = {}
+        self._db = None
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(path, timeout=5)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS mx_cache "
+                    "(domain TEXT PRIMARY KEY, status TEXT, hosts TEXT, expires_at REAL)"
+                )
+            except (sqlite3.Error, OSError) as e:
+                print(f"Error opening DNS cache, using memory only: {e}")
+                self.close()
+
+    def get(self, domain):
+        """
+        Returns:
+            tuple: (status, hosts) if cached and not expired, otherwise None
+        """
+        entry = self._entries.get(domain)
+        if entry is None and self._db is not None:
+            try:
+                row = self._db.execute(
+                    "SELECT status, hosts, expires_at FROM mx_cache WHERE domain = ?", (domain,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Error reading DNS cache for {domain}: {e}")
+                row = None
+            if row:
+                entry = (row[0], json.loads(row[1]), row[2])
+                self._entries[domain] = entry
+        if entry is None or entry[2] < time.time():
+            return None
+        return entry[0], entry[1]
+
+    def set(self, domain, status, hosts, ttl):
+        expires_at = time.time() + ttl
+        self._entries[domain] = (status, hosts, expires_at)
+        if self._db is not None:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO mx_cache VALUES (?, ?, ?, ?)",
+                    (domain, status, json.dumps(hosts), expires_at)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing DNS cache for {domain}: {e}")
+
+    def close(self):
+        if self._db is not None:
+            try:
+                self._db.close()
+            except sqlite3.Error:
+                pass
+            self._db = None
+
+
+class EmailVerifier:
+    """
+    Verify email deliverability with syntax, domain and MX checks, plus optional SMTP probing.
+
+    A single resolver and cache are shared by all lookups, and concurrent lookups
+    for the same domain (e.g. gmail.com) wait on one query instead of repeating it.
+    Use it as an async context manager (or call `close`) to release the cache.
+
+    Args:
+        nameservers (List[str], optional): DNS servers to query, defaults to the system ones
+        dns_port (int): Port of the DNS servers
+        dns_timeout (float): Seconds before a DNS lookup is given up
+        max_dns_queries (int): Maximum number of concurrent DNS queries
+        cache (DNSCache, optional): MX cache, defaults to the persistent one under `data/`
+        smtp_probe (bool): Ask the mail server whether it accepts each recipient
+        smtp_port (int): Port of the mail servers
+        smtp_timeout (float): Seconds before an SMTP probe is given up
+        max_smtp_connections (int): Maximum number of concurrent SMTP connections
+        max_smtp_per_host (int): Maximum number of concurrent SMTP connections per mail server,
+            shared by all the domains it hosts (e.g. every Google Workspace domain)
+        helo_host (str): Host name sent in the EHLO command
+        mail_from (str): Sender address used for the probes
+    """
+    def __init__(
+        self,
+        nameservers=None,
+        dns_port=53,
+        dns_timeout=5.0,
+        max_dns_queries=50,
+        cache=None,
+        smtp_probe=False,
+        smtp_port=25,
+        smtp_timeout=10.0,
+        max_smtp_connections=5,
+        max_smtp_per_host=1,
+        helo_host="localhost",
+        mail_from="verify@localhost",
+    ):
+        self.resolver = dns.asyncresolver.Resolver(configure=not nameservers)
+        if nameservers:
+            self.resolver.nameservers = nameservers
+        self.resolver.port = dns_port
+        self.resolver.lifetime = dns_timeout
+        self.cache = cache if cache is not None else DNSCache()
+        self.smtp_probe = smtp_probe
+        self.smtp_port = smtp_port
+        self.smtp_timeout = smtp_timeout
+        self.max_smtp_per_host = max_smtp_per_host
+        self.helo_host = helo_host
+        self.mail_from = mail_from
+        self._dns_semaphore = asyncio.Semaphore(max_dns_queries)
+        self._smtp_semaphore = asyncio.Semaphore(max_smtp_connections)
+        self._host_semaphores = {}
+        self._inflight = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the MX cache."""
+        self.cache.close()
+
+    async def resolve_mx(self, domain):
+        """
+        Find the mail servers of a domain, using the cache when possible.
+
+        Returns:
+            tuple: (status, hosts) with status one of VALID, NO_DOMAIN, NO_MX or UNKNOWN
+                and the mail server hosts sorted by preference
+        """
+        cached = self.cache.get(domain)
+        if cached is not None:
+            return cached
+
+        # Share a single lookup between concurrent callers for the same domain
+        task = self._inflight.get(domain)
+        if task is None:
+            task = asyncio.ensure_future(self._lookup_mx(domain))
+            self._inflight[domain] = task
+            task.add_done_callback(lambda _: self._inflight.pop(domain, None))
+        return await task
+
+    async def _lookup_mx(self, domain):
+        async with self._dns_semaphore:
+            try:
+                answer = await self.resolver.resolve(domain, "MX")
+                records = sorted(answer, key=lambda record: record.preference)
+                # A null MX (".") means the domain explicitly doesn't accept mail
+                hosts = [str(r.exchange).rstrip(".") for r in records if str(r.exchange) != "."]
+                result, ttl = ((VALID, hosts) if hosts else (NO_MX, [])), answer.rrset.ttl
+            except dns.resolver.NXDOMAIN:
+                result, ttl = (NO_DOMAIN, []), NEGATIVE_TTL
+            except dns.resolver.NoAnswer:
+                # No MX record, mail goes to the domain's A record if it has one
+                result, ttl = await self._lookup_fallback(domain)
+            except (dns.resolver.NoNameservers, dns.exception.Timeout) as e:
+                # Don't cache transient failures
+                print(f"Error resolving MX for {domain}: {e}")
+                return UNKNOWN, []
+
+        if ttl is not None:
+            self.cache.set(domain, result[0], result[1], ttl)
+        return result
+
+    async def _lookup_fallback(self, domain):
+        try:
+            answer = await self.resolver.resolve(domain, "A")
+            return (VALID, [domain]), answer.rrset.ttl
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            return (NO_MX, []), NEGATIVE_TTL
+        except (dns.resolver.NoNameservers, dns.exception.Timeout) as e:
+            print(f"Error resolving A record for {domain}: {e}")
+            return (UNKNOWN, []), None
+
+    async def _probe_smtp(self, email, hosts):
+        """
+        Ask the domain's mail servers whether they accept the recipient,
+        without sending any message.
+        """
+        for host in hosts:
+            # Cap connections per mail server, not per recipient domain
+            host_semaphore = self._host_semaphores.setdefault(
+                host.lower(), asyncio.Semaphore(self.max_smtp_per_host)
+            )
+            async with host_semaphore, self._smtp_semaphore:
+                try:
+                    return await asyncio.wait_for(self._smtp_conversation(host, email), self.smtp_timeout)
+                except (OSError, asyncio.TimeoutError, ConnectionError, ValueError) as e:
+                    # Unreachable server or unparsable reply, try the next mail server
+                    print(f"Error probing {host} for {email}: {e}")
+        return UNKNOWN
+
+    async def _smtp_conversation(self, host, email):
+        reader, writer = await asyncio.open_connection(host, self.smtp_port)
+        try:
+            async def command(line=None):
+                if line is not None:
+                    writer.write(f"{line}\r\n".encode())
+                    await writer.drain()
+                # Multi-line replies use "250-" on every line but the last
+                while True:
+                    reply = await reader.readline()
+                    if not reply:
+                        raise ConnectionError("Connection closed by server")
+                    if reply[3:4] != b"-":
+                        return int(reply[:3])
+
+            if await command() != 220:
+                return UNKNOWN
+            if await command(f"EHLO {self.helo_host}") != 250:
+                return UNKNOWN
+            if await command(f"MAIL FROM:<{self.mail_from}>") != 250:
+                return UNKNOWN
+            code = await command(f"RCPT TO:<{email}>")
+            writer.write(b"QUIT\r\n")
+            await writer.drain()
+        finally:
+            writer.close()
+
+        if code in (250, 251):
+            return DELIVERABLE
+        if 500 <= code < 600:
+            return UNDELIVERABLE
+        # 4xx is usually greylisting, the address may still be fine
+        return UNKNOWN
+
+    async def verify(self, email):
+        """
+        Verify a single email address.
+
+        Returns:
+            str: Verification status of the email
+        """
+        domain = check_email_syntax(email)
+        if domain is None:
+            return INVALID_SYNTAX
+        status, hosts = await self.resolve_mx(domain)
+        if status != VALID or not self.smtp_probe:
+            return status
+        return await self._probe_smtp(email, hosts)
+
+    async def verify_many(self, emails):
+        """
+        Verify a list of email addresses concurrently, each unique address only once.
+
+        Returns:
+            Dict[str, str]: Verification status keyed by email
+        """
+        unique_emails = list(dict.fromkeys(emails))
+        statuses = await asyncio.gather(
+            *(self.verify(email) for email in unique_emails), return_exceptions=True
+        )
+
+        # A single failing address shouldn't fail the whole batch
+        results = {}
+        for email, status in zip(unique_emails, statuses):
+            if isinstance(status, Exception):
+                print(f"Error verifying {email}: {status}")
+                status = UNKNOWN
+            results[email] = status
+        return results
+
+
+async def add_email_status(df, verifier):
+    """
+    Verify every email of the businesses and store the results in an 'email_status' column,
+    one status per email in the same order as the 'email' column.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing the businesses
+        verifier (EmailVerifier): Verifier used for the lookups
+    """
+    # One row per email, so each address is verified once for the whole sheet
+    emails = df["email"].astype(str).str.split(" || ", regex=False).explode().str.strip()
+    emails = emails[emails != ""]
+    statuses = await verifier.verify_many(emails.tolist())
+
+    email_status = emails.map(statuses).groupby(level=0).agg(" || ".join)
+    email_status = email_status.reindex(df.index, fill_value="")
+    if "email_status" in df.columns:
+        df["email_status"] = email_status
+    else:
+        df.insert(df.columns.get_loc("email") + 1, "email_status", email_status)
+
+async def verify_business_emails(excel_file, verifier=None):
+    """
+    Verify the emails found during enrichment and update the Excel file.
+
+    Args:
+        excel_file (str): Path to the Excel file to update
+        verifier (EmailVerifier, optional): Verifier to use, defaults to DNS checks only.
+            A verifier passed in is left open, the caller must close it
+            (e.g. by using it as an async context manager)
+    """
+    df, file_path = load_excel_data(excel_file)
+
+    if verifier is not None:
+        await add_email_status(df, verifier)
+    else:
+        async with EmailVerifier() as verifier:
+            await add_email_status(df, verifier)
+
+    # Save the updated DataFrame back to Excel
+    try:
+        df.to_excel(file_path, index=False)
+    except Exception as e:
+        print(f"Error saving Excel file: {e}")
@@ -0,0 +1,270 @@
+import time
+import uuid
+import asyncio
+import threading
+from io import BytesIO
+from .places_api import search_places, get_coordinates
+from .business_info import process_businesses
+from .data_export import save_places_to_excel, merge_business_data, load_excel_data
+from .planner import Budget
+from .email_verifier import EmailVerifier, add_email_status
+from .utils import get_current_date
+
+
+# Job lifecycle states
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+# Finished jobs are dropped after this many seconds, or once there are too many
+FINISHED_JOB_TTL = 6 * 3600
+MAX_FINISHED_JOBS = 20
+
+
+class Job:
+    """
+    State of a single lead generation run executed in a background thread.
+
+    All mutable fields are guarded by `lock` because they are written from the
+    job thread and read from the Streamlit script thread.
+    """
+    def __init__(self, location, search_query, num_pages, budget_limits=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.location = location
+        self.search_query = search_query
+        self.num_pages = num_pages
+        self.budget_limits = budget_limits or {}
+        self.budget = None
+        self.status = PENDING
+        self.message = "Waiting to start..."
+        self.error = None
+        self.file_path = None
+        self.total = 0
+        self.processed = 0
+        self.df = None
+        self.version = 0
+        self._pending_results = {}
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self._thread = None
+        self._excel_cache = (None, None)
+        self.updated_at = time.time()
+
+    @property
+    def is_active(self):
+        return self.status in (PENDING, RUNNING)
+
+    def snapshot(self):
+        """
+        Return a copy of the current results so the UI never reads a DataFrame
+        that is being written to.
+        """
+        with self.lock:
+            self._flush_results()
+            return self.df.copy() if self.df is not None else None
+
+    def to_excel_bytes(self):
+        """
+        Serialize the in-memory results to an Excel workbook.
+        The bytes are cached until new results come in.
+        """
+        with self.lock:
+            version, data = self._excel_cache
+            if version == self.version or self.df is None:
+                return data
+            self._flush_results()
+            df, version = self.df.copy(), self.version
+
+        buffer = BytesIO()
+        df.to_excel(buffer, index=False)
+        data = buffer.getvalue()
+        with self.lock:
+            self._excel_cache = (version, data)
+        return data
+
+    def _flush_results(self):
+        # Merge streamed rows in one batch, only when the results are read
+        if self._pending_results and self.df is not None:
+            merge_business_data(self.df, self._pending_results)
+            self._pending_results = {}
+
+    def _update(self, **fields):
+        with self.lock:
+            for key, value in fields.items():
+                setattr(self, key, value)
+            self.version += 1
+            self.updated_at = time.time()
+
+
+class JobManager:
+    """
+    Run lead generation jobs outside of the Streamlit script thread.
+
+    Each job runs its own asyncio event loop in a daemon thread, and streams
+    enriched rows into an in-memory DataFrame the UI can poll at any time.
+    """
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get_job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def start_job(self, location, search_query, num_pages, budget_limits=None):
+        """
+        Create a new job and start it in the background.
+
+        Args:
+            location (str): Location to search (city, address, etc.)
+            search_query (str): What to search for (restaurants, dentists, etc.)
+            num_pages (int): Number of pages to fetch (20 results per page)
+            budget_limits (dict, optional): `Budget` limits (max_tokens, max_cost, max_seconds)
+                applied to each enrichment run of the job
+
+        Returns:
+            Job: The newly started job
+        """
+        job = Job(location, search_query, num_pages, budget_limits)
+        with self._lock:
+            self._evict_finished_jobs()
+            self._jobs[job.id] = job
+        self._launch(job, self._run_search_and_enrich(job))
+        return job
+
+    def cancel_job(self, job_id):
+        """
+        Ask a running job to stop. The row currently being processed finishes
+        first, then progress is saved so the job can be resumed later.
+        """
+        job = self.get_job(job_id)
+        if job and job.is_active:
+            job.cancel_event.set()
+            job._update(message="Cancelling after the current business...")
+
+    def resume_job(self, job_id):
+        """
+        Restart enrichment of a cancelled or failed job with a fresh budget.
+        Businesses already marked as searched in the Excel file are skipped.
+        """
+        job = self.get_job(job_id)
+        if not job:
+            return None
+        
+        # Check and claim the job atomically so two reruns can't both resume it
+        with job.lock:
+            if job.is_active or not job.file_path:
+                return None
+            job.status = PENDING
+            job.message = "Resuming..."
+            job.error = None
+            job.version += 1
+            job.updated_at = time.time()
+            job.cancel_event.clear()
+        self._launch(job, self._run_enrich(job))
+        return job
+
+    def _evict_finished_jobs(self):
+        # Free the results of old finished jobs, running jobs are always kept
+        finished = sorted(
+            (job for job in self._jobs.values() if not job.is_active),
+            key=lambda job: job.updated_at,
+            reverse=True,
+        )
+        expired_before = time.time() - FINISHED_JOB_TTL
+        for rank, job in enumerate(finished):
+            if rank >= MAX_FINISHED_JOBS or job.updated_at < expired_before:
+                del self._jobs[job.id]
+
+    def _launch(self, job, coroutine):
+        job._thread = threading.Thread(
+            target=asyncio.run, args=(coroutine,), name=f"job-{job.id}", daemon=True
+        )
+        job._thread.start()
+
+    async def _run_search_and_enrich(self, job):
+        try:
+            # Step 1: Get coordinates from location
+            job._update(status=RUNNING, message="🔍 Getting coordinates for location...")
+            coords = get_coordinates(job.location)
+            if not coords:
+                job._update(
+                    status=FAILED,
+                    error="Could not get coordinates for the location. Please check the location name and try again."
+                )
+                return
+
+            # Step 2: Search for places using Serper Maps API
+            job._update(message="🔍 Searching for businesses using Serper Maps API...")
+            places_data = search_places(job.search_query, coords, job.num_pages)
+            if not places_data:
+                job._update(status=FAILED, error="No places found. Try a different search query or location.")
+                return
+
+            # Step 3: Save places data to Excel
+            job._update(message="💾 Saving initial data to Excel...")
+            excel_filename = f"data_{job.search_query}_{job.location}_{get_current_date()}.xlsx"
+            file_path = save_places_to_excel(places_data, excel_filename)
+            if not file_path:
+                job._update(status=FAILED, error="No places found. Try a different search query or location.")
+                return
+            job._update(file_path=file_path)
+        except Exception as e:
+            job._update(status=FAILED, error=str(e))
+            return
+
+        # Step 4: Process businesses to get detailed information
+        await self._run_enrich(job)
+
+    async def _run_enrich(self, job):
+        try:
+            df, _ = load_excel_data(job.file_path)
+            budget = Budget(**job.budget_limits)
+            # Only businesses with a website get enriched
+            has_website = df["website"] != ""
+            job._update(
+                status=RUNNING,
+                df=df,
+                _pending_results={},
+                budget=budget,
+                total=int(has_website.sum()),
+                processed=int((has_website & (df["searched"] == "YES")).sum()),
+                message="🌐 Processing businesses to extract detailed information...",
+            )
+
+            async def progress_callback(total, current, business_name):
+                job._update(message=f"Processing: {current + 1}/{total} - {business_name}")
+
+            async def result_callback(index, info):
+                # Buffer each enriched row until the UI next reads the results
+                with job.lock:
+                    job._pending_results[index] = info
+                    job.processed += 1
+                    job.version += 1
+
+            await process_businesses(
+                job.file_path,
+                progress_callback=progress_callback,
+                result_callback=result_callback,
+                cancel_event=job.cancel_event,
+                target_category=job.search_query,
+                budget=budget,
+            )
+
+            exhausted = budget.exhausted()
+            if job.cancel_event.is_set():
+                job._update(status=CANCELLED, message="⏸️ Lead generation cancelled. You can resume it later.")
+            elif exhausted and job.processed < job.total:
+                job._update(status=CANCELLED, message=f"⏸️ Lead generation stopped, {exhausted}. You can resume it later.")
+            else:
+                # Step 5: Check the deliverability of the emails found
+                job._update(message="📧 Verifying emails...")
+                df = job.snapshot()
+                async with EmailVerifier() as verifier:
+                    await add_email_status(df, verifier)
+                df.to_excel(job.file_path, index=False)
+                job._update(df=df, status=COMPLETED, message="✅ Lead generation complete!")
+        except Exception as e:
+            job._update(status=FAILED, error=str(e))
@@ -0,0 +1,248 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from urllib.parse import urlparse
+
+# Directory and listing hosts that describe businesses rather than belong to them,
+# not worth scraping. Sites a business builds itself (Google Sites, Business Profile
+# sites, link pages) hold its own contacts and must not be listed here.
+AGGREGATOR_DOMAINS = [
+    "yelp.com", "facebook.com", "instagram.com", "twitter.com", "x.com", "linkedin.com",
+    "maps.google.com", "yellowpages.com", "yellowpages.ca",
+    "tripadvisor.com", "houzz.com", "angi.com", "homeadvisor.com", "thumbtack.com",
+    "bbb.org", "nextdoor.com", "zillow.com", "realtor.com", "realtor.ca", "booking.com",
+]
+
+# Social networks whose page can be used directly when set as the business website
+SOCIAL_DOMAINS = {
+    "facebook.com": "facebook",
+    "instagram.com": "instagram",
+    "twitter.com": "twitter",
+    "x.com": "twitter",
+}
+
+# Columns read by the planner
+PLAN_COLUMNS = ["name", "website", "address", "searched", "rating", "reviews", "category", "keywords"]
+
+# Weight of each signal in the priority score (sums to 1)
+SCORE_WEIGHTS = {
+    "rating": 0.25,
+    "reviews": 0.35,
+    "category": 0.25,
+    "uniqueness": 0.15,
+}
+
+# LLM prices in dollars per million (input, output) tokens
+MODEL_PRICING = {
+    "openai/gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "openai/gpt-4o-mini": (0.15, 0.60),
+    "anthropic/claude-3-haiku": (0.25, 1.25),
+    "anthropic/claude-3.5-sonnet": (3.00, 15.00),
+    "deepseek/deepseek-chat": (0.27, 1.10),
+    "mistral/mistral-large-2": (2.00, 6.00),
+}
+
+
+class Budget:
+    """
+    Hard limits on LLM tokens, dollars and wall-clock time for an enrichment run.
+    A limit left to None is not enforced.
+
+    Dollar costs use `MODEL_PRICING` for the model, or the explicit `input_price` and
+    `output_price` (dollars per million tokens). For a model with unknown prices the
+    cost limit is not enforced and `warning` explains why.
+    """
+    def __init__(
+        self,
+        max_tokens=None,
+        max_cost=None,
+        max_seconds=None,
+        model=None,
+        input_price=None,
+        output_price=None
+    ):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.max_seconds = max_seconds
+        self.warning = None
+        
+        # Default to the model used by the business analysis
+        model = model or os.getenv("LLM_MODEL", "gpt-4.1-mini")
+        if input_price is not None and output_price is not None:
+            self.input_price, self.output_price = input_price, output_price
+        elif model in MODEL_PRICING:
+            self.input_price, self.output_price = MODEL_PRICING[model]
+        else:
+            self.input_price = self.output_price = None
+            if max_cost is not None:
+                self.warning = (
+                    f"No pricing known for model '{model}', the ${max_cost:.2f} cost limit is not enforced. "
+                    "Pass input_price and output_price to enforce it."
+                )
+                print(f"Warning: {self.warning}")
+                self.max_cost = None
+        
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.started_at = time.monotonic()
+
+    def start(self):
+        """Restart the wall-clock timer."""
+        self.started_at = time.monotonic()
+
+    def record_usage(self, input_tokens, output_tokens):
+        """Add the tokens used by one LLM call."""
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+
+    @property
+    def tokens(self):
+        return self.input_tokens + self.output_tokens
+
+    @property
+    def cost(self):
+        """Dollars spent so far, or None if the model's prices are unknown."""
+        if self.input_price is None:
+            return None
+        return (self.input_tokens * self.input_price + self.output_tokens * self.output_price) / 1_000_000
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def exhausted(self):
+        """
+        Check every limit.
+
+        Returns:
+            str: Description of the exhausted limit, or None if there is budget left
+        """
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            return f"token budget of {self.max_tokens} reached"
+        if self.max_cost is not None and self.cost >= self.max_cost:
+            return f"cost budget of ${self.max_cost:.2f} reached"
+        if self.max_seconds is not None and self.elapsed >= self.max_seconds:
+            return f"time budget of {self.max_seconds:.0f}s reached"
+        return None
+
+
+def get_domain(url):
+    """
+    Extract the host of a URL, without 'www.'.
+    Returns an empty string for values that aren't URLs (e.g. "N/A").
+    """
+    if not url:
+        return ""
+    if "://" not in url:
+        url = f"http://{url}"
+    try:
+        host = (urlparse(url).hostname or "").lower()
+    except ValueError:
+        return ""
+    if "." not in host:
+        return ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def get_page(url):
+    """
+    Normalize a URL to its host and path, without 'www.', query string or trailing slash,
+    so the same website written differently compares equal.
+    Returns an empty string for values that aren't URLs.
+    """
+    domain = get_domain(url)
+    if not domain:
+        return ""
+    if "://" not in url:
+        url = f"http://{url}"
+    return domain + urlparse(url).path.rstrip("/").lower()
+
+
+def _matches(domain, known_domain):
+    return domain == known_domain or domain.endswith(f".{known_domain}")
+
+
+def is_aggregator(domain):
+    return any(_matches(domain, d) for d in AGGREGATOR_DOMAINS)
+
+
+def get_social_network(domain):
+    return next((network for d, network in SOCIAL_DOMAINS.items() if _matches(domain, d)), None)
+
+
+def plan_businesses(df, target_category=None, min_score=0.0):
+    """
+    Score the businesses still to enrich and decide how each one is handled.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing the businesses
+        target_category (str, optional): Search query the leads should match,
+            defaults to the most common category in the sheet
+        min_score (float): Rows scoring below this are deferred to a later run
+
+    Returns:
+        pd.DataFrame: Pending rows sorted by descending score, with columns
+            'domain', 'page', 'score' and 'action', where action is one of:
+            - 'enrich': scrape the website and analyze it with the LLM
+            - 'social': website is a social page, use it as the profile link
+            - 'skip': aggregator or directory listing, nothing to scrape
+            - 'duplicate': same website page as a higher scored row, reuse its result
+            - 'defer': score below min_score, left unsearched
+    """
+    # Sheets from older runs may lack some columns, read them as empty values
+    columns = df.reindex(columns=PLAN_COLUMNS, fill_value="")
+    pending = (columns["website"] != "") & (columns["searched"] != "YES")
+    plan = columns.loc[pending, ["name", "website", "address"]].copy()
+    if plan.empty:
+        return plan.assign(domain="", page="", score=0.0, action="")
+
+    plan["domain"] = plan["website"].map(get_domain)
+    plan["page"] = plan["website"].map(get_page)
+
+    # Rating only counts when backed by reviews
+    rating = pd.to_numeric(columns.loc[plan.index, "rating"], errors="coerce").fillna(0)
+    reviews = pd.to_numeric(columns.loc[plan.index, "reviews"], errors="coerce").fillna(0)
+    rating_score = (rating / 5).clip(0, 1) * (reviews > 0)
+    reviews_score = np.log1p(reviews) / max(np.log1p(reviews.max()), 1)
+
+    # Share of the target category words found in the business category and keywords
+    if not target_category:
+        categories = columns.loc[columns["category"] != "", "category"]
+        target_category = categories.mode().iloc[0] if not categories.empty else ""
+    # Plurals are trimmed so "Realtors" also matches "Realtor"
+    words = [w.rstrip("s") if len(w) > 3 else w for w in str(target_category).lower().split() if len(w) > 2]
+    text = (
+        columns.loc[plan.index, "category"].astype(str) + " " + columns.loc[plan.index, "keywords"].astype(str)
+    ).str.lower()
+    if words:
+        category_score = sum(text.str.contains(w, regex=False).astype(float) for w in words) / len(words)
+    else:
+        category_score = pd.Series(0.0, index=plan.index)
+
+    # Chains and franchises sharing one website are worth less than independents.
+    # Websites without a domain (e.g. "N/A") are not shared with anyone.
+    has_domain = plan["domain"] != ""
+    uniqueness_score = (1 / plan.groupby("domain")["domain"].transform("size")).where(has_domain, 1.0)
+
+    plan["score"] = (
+        SCORE_WEIGHTS["rating"] * rating_score
+        + SCORE_WEIGHTS["reviews"] * reviews_score
+        + SCORE_WEIGHTS["category"] * category_score
+        + SCORE_WEIGHTS["uniqueness"] * uniqueness_score
+    )
+    plan = plan.sort_values("score", ascending=False, kind="stable")
+
+    # Decide how each row is handled, cheapest option first
+    social = plan["domain"].map(get_social_network)
+    aggregator = plan["domain"].map(is_aggregator)
+    plan["action"] = "enrich"
+    # Only the exact same page is a duplicate, rows sharing a host (e.g. agent pages
+    # on a brokerage website) are distinct businesses
+    plan.loc[plan["page"].duplicated() & (plan["page"] != "") & ~aggregator, "action"] = "duplicate"
+    plan.loc[aggregator, "action"] = "skip"
+    plan.loc[social.notna(), "action"] = "social"
+    plan.loc[(plan["action"] == "enrich") & (plan["score"] < min_score), "action"] = "defer"
+
+    return plan
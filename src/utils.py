@@ -18,7 +18,8 @@ async def ainvoke_llm(
     system_prompt,
     user_message,
     response_format=None,
-    temperature=0.1
+    temperature=0.1,
+    budget=None
 ):
     llm = ChatOpenAI(
         model=model, 
@@ -28,8 +29,9 @@ async def ainvoke_llm(
     )
     
     # If Response format is provided, use structured output
+    # (keeping the raw message so token usage can be recorded)
     if response_format:
-        llm = llm.with_structured_output(response_format)
+        llm = llm.with_structured_output(response_format, include_raw=True)
     
     # Prepare messages
     messages = [
@@ -39,5 +41,15 @@ async def ainvoke_llm(
     
     # Invoke LLM asynchronously
     response = await llm.ainvoke(messages)
+    message = response["raw"] if response_format else response
     
-    return response if response_format else response.content  # Return structured response or string
+    # Track token usage against the budget if provided
+    usage = getattr(message, "usage_metadata", None)
+    if budget is not None and usage:
+        budget.record_usage(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+    
+    if response_format:
+        if response.get("parsing_error"):
+            raise response["parsing_error"]
+        return response["parsed"]  # Return structured response
+    return response.content  # Return string